@@ -3,55 +3,61 @@
 import sys
 import json
 
-from dns_tls_constants import short_unpack, byte_pack, dns_header_pack, fast_sleep
+from dns_tls_constants import short_unpackf, byte_pack, dns_header_pack, fast_sleep
 
-def is_pointer(data):
-    return True if 192 & data == 192 else False
-
-def calculate_pointer(data):
-    '''returns the integer value of the sum of 0-15 bits on 2 byte value. the integer value
+def calculate_pointer(data, offset=0):
+    '''returns the integer value of the sum of 0-15 bits on 2 byte value at offset. the integer value
     represents the string index of place to look for dns data. 12 bytes will be subtracted
     from the result since we are not including dns header in reference data.'''
-    return 16383 & short_unpack(data)[0] - 12
-
-def parse_query_name(data, dns_query=None, *, qname=False):
-    '''parses dns name from sent in data. uses overall dns query to follow pointers. will return
-    name and offset integer value if qname arg is True otherwise will only return offset.'''
-    offset, pointer_present = 0, False
-    query_name = []
+    return 16383 & short_unpackf(data, offset)[0] - 12
+
+def parse_query_name(data, offset=0, *, qname=False):
+    '''parses dns name starting at offset of sent in data. data must be the overall dns query so
+    pointers can be followed without slicing. will return name and name length integer value if
+    qname arg is True otherwise will only return name length. pointers must point strictly backwards
+    from the start of the current name section, otherwise ValueError is raised.'''
+    idx, name_len, section_start = offset, 0, offset
+    query_name = bytearray()
     while True:
-        length = data[0]
+        length = data[idx]
         # length of 0 is a root entry (name stop byte)
         if (length == 0):
 
-            #if we have followed a pointer we will not adjust offset for data
-            if (not pointer_present):
-                offset += 1
+            #if we have followed a pointer the name length was already set
+            if (not name_len):
+                name_len = idx + 1 - offset
             break
 
-        # looking for a dns pointer. if detected the pointer will be followedS
-        if (is_pointer(length)):
-            data = dns_query[calculate_pointer(data[:2]):]
+        # looking for a dns pointer (top 2 bits set). if detected the pointer will be followed.
+        if (length & 192 == 192):
+
+            # if this is the first pointer followed the name ends after the 2 byte pointer value.
+            # subsequent pointers will not change the name length.
+            if (not name_len):
+                name_len = idx + 2 - offset
 
-            # if this is the first pointer followed we will apply a 2 byte offset for pointer value
-            # then set the pointer present to true to ensure we do not add offset for subsequent pointers
-            if (not pointer_present):
-                offset += 2
+            # only following pointers to earlier data so pointer loops cannot be formed.
+            idx = calculate_pointer(data, idx)
+            if (idx >= section_start):
+                raise ValueError('dns name pointer does not point to prior data.')
 
-            pointer_present = True
+            section_start = idx
             continue
 
-        # name len + interger value of initial length
-        if (not pointer_present):
-            offset += length + 1
+        # label bytes are collected with dot separators and decoded once after the name is parsed.
+        if (qname):
+            if (query_name):
+                query_name.append(46)
+
+            query_name += data[idx+1:idx+1+length]
 
-        query_name.append(data[1:1+length].decode())
-        data = data[length+1:]
+        # name len + interger value of initial length
+        idx += length + 1
 
     if (qname):
-        return '.'.join(query_name), offset
+        return query_name.decode(), name_len
 
-    return offset
+    return name_len
 
 def convert_dns_string_to_bytes(domain_name):
     if (not domain_name):
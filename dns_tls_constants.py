@@ -2,7 +2,7 @@
 
 import time as _time
 
-from struct import Struct as _Struct
+from struct import Struct as _Struct, error as _struct_error
 from enum import IntEnum as _IntEnum
 from collections import namedtuple as _namedtuple
 
@@ -24,6 +24,9 @@ KEEP_ALIVE_DOMAIN = 'duckduckgo.com'
 NOT_VALID = -1
 NULL_ADDR = (None, None)
 
+# errors raised by packet parsers on malformed or truncated dns data
+PACKET_PARSE_ERRORS = (IndexError, ValueError, _struct_error)
+
 # times
 NO_DELAY = 0
 MSEC = .001
@@ -45,18 +48,18 @@ CACHED_RECORD = _namedtuple('cached_record', 'expire ttl records')
 RESOURCE_RECORD = _ByteContainer('resource_record', 'name qtype qclass ttl data')
 
 # COMPILED STRUCTS
-dns_header_unpack = _Struct('!6H').unpack
+dns_header_unpack = _Struct('!6H').unpack_from
 dns_header_pack   = _Struct('!6H').pack
 
 resource_record_pack = _Struct('!3HLH4s').pack
+# name pointer, qtype, qclass, ttl, data len + ipv4 address
+a_record_unpack = _Struct('!2s2s2s4s6s').unpack_from
 
 short_unpackf = _Struct('!H').unpack_from
 
 byte_pack = _Struct('!B').pack
-short_unpack = _Struct('!H').unpack
 short_pack   = _Struct('!H').pack
 long_pack    = _Struct('!L').pack
-long_unpack  = _Struct('!L').unpack
 
 double_short_unpack = _Struct('!2H').unpack_from
 double_short_pack   = _Struct('!2H').pack
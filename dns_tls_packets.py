@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 
-import traceback
-
 from collections import namedtuple
 
 from dns_tls_constants import * # pylint: disable=unused-wildcard-import
@@ -10,11 +8,10 @@ from basic_tools import * # pylint: disable=unused-wildcard-import
 class ClientRequest:
     __slots__ = (
         # protected vars
-        '_data', '_dns_header', '_dns_query',
+        '_data', '_dns_query',
 
         # public vars - init
-        'address', 'sock', 'intf', 'top_domain',
-        'keepalive', 'dom_local', 'fallback',
+        'address', 'sock', 'top_domain', 'dom_local',
         'dns_id', 'request', 'send_data',
         'arc', 'additional_data',
 
@@ -22,7 +19,7 @@ class ClientRequest:
         'qr', 'op', 'aa', 'tc', 'rd',
         'ra', 'zz', 'ad', 'cd', 'rc',
 
-        'requests', 'qtype', 'qclass', 'question_record'
+        'qtype', 'qclass', 'question_record'
     )
 
     def __init__(self, data, address, sock):
@@ -30,13 +27,10 @@ class ClientRequest:
         self.address = address
         self.sock = sock
         if (data):
-            self._dns_header = data[:12]
-            self._dns_query  = data[12:]
+            self._dns_query = memoryview(data)[12:]
 
         self.top_domain = False
-        self.keepalive  = False
         self.dom_local  = False
-        self.fallback   = False
 
         self.dns_id    = 1
         self.request   = None
@@ -51,35 +45,37 @@ class ClientRequest:
 
     def parse(self):
         if (not self._data):
-            raise TypeError(f'{__class__.__name__} cannot parse data set to None.')
+            raise TypeError(f'{self.__class__.__name__} cannot parse data set to None.')
 
         self._parse_header()
         self._parse_dns_query()
 
     def _parse_header(self):
-        dns_header = dns_header_unpack(self._dns_header)
-        self.dns_id = dns_header[0]
-        self.qr = dns_header[1] >> 15 & 1
-        self.op = dns_header[1] >> 11 & 15
-        self.aa = dns_header[1] >> 10 & 1
-        self.tc = dns_header[1] >> 9  & 1
-        self.rd = dns_header[1] >> 8  & 1
-        self.ra = dns_header[1] >> 7  & 1
-        self.zz = dns_header[1] >> 6  & 1
-        self.ad = dns_header[1] >> 5  & 1
-        self.cd = dns_header[1] >> 4  & 1
-        self.rc = dns_header[1]       & 15
+        # only the id and flags are needed from the client header
+        self.dns_id, flags = double_short_unpack(self._data)
+        self.qr = flags >> 15 & 1
+        self.op = flags >> 11 & 15
+        self.aa = flags >> 10 & 1
+        self.tc = flags >> 9  & 1
+        self.rd = flags >> 8  & 1
+        self.ra = flags >> 7  & 1
+        self.zz = flags >> 6  & 1
+        self.ad = flags >> 5  & 1
+        self.cd = flags >> 4  & 1
+        self.rc = flags       & 15
 
     def _parse_dns_query(self):
         dns_query = self._dns_query
 
         request, offset = parse_query_name(dns_query, qname=True) # www.micro.com or micro.com || sd.micro.com
-        if ('.' not in request or request.endswith('.local')):
+        # single scan from the right for the tld. no tld (single label) or .local will not be relayed.
+        _, dot, tld = request.rpartition('.')
+        if (not dot or tld == 'local'):
             self.dom_local = True
 
         self.request = request
 
-        self.qtype, self.qclass = double_short_unpack(dns_query[offset:])
+        self.qtype, self.qclass = double_short_unpack(dns_query, offset)
         self.question_record = dns_query[:offset+4] # ofsset + 4 byte info
         self.additional_data = dns_query[offset+4:]
 
@@ -91,9 +87,12 @@ class ClientRequest:
             self.dns_id, len(cached_dom.records), rd=self.rd, cd=self.cd
         )]
         send_data.append(self.question_record)
+
+        # all cached records share the calculated ttl so it only needs to be packed once per response
+        cached_ttl = long_pack(cached_dom.ttl)
         for record in cached_dom.records:
-            record.update('ttl', long_pack(cached_dom.ttl))
-            send_data.append(b''.join(record))
+            record.update('ttl', cached_ttl)
+            send_data.extend(record)
 
         self.send_data = b''.join(send_data)
 
@@ -104,15 +103,15 @@ class ClientRequest:
         # if additional data seen after question record, will mark additional record count as 1 in dns header
         if (self.additional_data):
             self.arc = 1
-        send_data = [b'\x00\x00', create_dns_query_header(dns_id, self.arc, cd=self.cd)]
-        send_data.append(convert_dns_string_to_bytes(self.request))
-        send_data.append(double_short_pack(self.qtype, 1))
-        send_data.append(self.additional_data)
+        request = convert_dns_string_to_bytes(self.request)
 
-        # replacing first 2 bytes with data len
-        send_data[0] = short_pack(len(b''.join(send_data[1:])))
-
-        self.send_data = b''.join(send_data)
+        # tls length prefix is calculated up front. 12 bytes(header) + name + 4 bytes(type, class) + additional data
+        self.send_data = b''.join([
+            short_pack(16 + len(request) + len(self.additional_data)),
+            create_dns_query_header(dns_id, self.arc, cd=self.cd),
+            request, double_short_pack(self.qtype, 1),
+            self.additional_data
+        ])
 
     @classmethod
     def generate_local_query(cls, request, cd=1):
@@ -144,24 +143,27 @@ class ClientRequest:
 # used for creating record data set in server response constructor
 _records = namedtuple('records', 'resource authority')
 
+# packed forms of the ttl bounds so clamped records do not need to be packed per response
+_MINIMUM_TTL_PACKED = long_pack(MINIMUM_TTL)
+_DEFAULT_TTL_PACKED = long_pack(DEFAULT_TTL)
+
 
 class ServerResponse:
     __slots__ = (
-        '_data', '_dns_header', '_dns_query',
+        '_data', '_dns_query',
         '_offset',
 
         'dns_id', 'dns_flags', 'question_count',
         'records', 'additional_count',
 
         'qtype', 'qclass', 'question_record',
-        'resource_record', 'data_to_cache',
+        'data_to_cache',
         'send_data'
     )
 
     def __init__(self, data):
-        self._data       = data
-        self._dns_header = data[:12]
-        self._dns_query  = data[12:]
+        self._data      = data
+        self._dns_query = memoryview(data)[12:]
 
         self.data_to_cache = None
         self.dns_id    = 0
@@ -177,70 +179,76 @@ class ServerResponse:
         self._resource_record_handler()
 
     def _header(self):
-        dns_header = dns_header_unpack(self._dns_header)
-        self.dns_id         = dns_header[0]
-        self.dns_flags      = dns_header[1]
-        self.question_count = dns_header[2]
-        self.records.resource['rcv_count']  = dns_header[3]
-        self.records.authority['rcv_count'] = dns_header[4]
-        self.additional_count = dns_header[5]
+        (self.dns_id, self.dns_flags, self.question_count,
+            resource_count, authority_count, self.additional_count) = dns_header_unpack(self._data)
+
+        self.records.resource['rcv_count']  = resource_count
+        self.records.authority['rcv_count'] = authority_count
 
     def _question_record_handler(self):
         dns_query = self._dns_query
 
         offset = parse_query_name(dns_query) # www.micro.com or micro.com || sd.micro.com
 
-        self.qtype, self.qclass = double_short_unpack(dns_query[offset:])
+        self.qtype, self.qclass = double_short_unpack(dns_query, offset)
         self.question_record = dns_query[:offset+4] # ofsset + 4 byte info
-        self.resource_record = dns_query[offset+4:]
 
     # grabbing the records contained in the packet and appending them to their designated lists to be inspected by other methods.
     # count of records is being grabbed/used from the header information
     def _resource_record_handler(self):
-        a_record_count, offset = 0, 0
+        dns_query = self._dns_query
+
+        # offsets are relative to the dns query so names can be parsed in place. records start after the question.
+        a_record_count, offset = 0, len(self.question_record)
+
+        # binding method and constant lookups to locals since they are used for every record
+        get_new_ttl = self._get_new_ttl
+        a_record, max_a_record_count = DNS.AR, MAX_A_RECORD_COUNT
+
         # parsing standard and authority records
-        for r_field in self.records:
+        for i, r_field in enumerate(self.records):
+            records_add, original_ttl = r_field['records'].append, 0
 
             # iterating once for every record based on count sent. if this number is forged/tampered with
             # it will cause the parsing to fail. NOTE: ensure this isnt fatal
             for _ in range(r_field['rcv_count']):
-                record_type, record, offset = self._parse_resource_record(offset)
+                record = None
+
+                # creating byte container of dns record values. dns query is a memoryview so only the container
+                # fields are copied out of the packet. pointer compressed a records have a fixed 16 byte layout so
+                # all fields can be split out with one struct call.
+                if (dns_query[offset] & 192 == 192 and short_unpackf(dns_query, offset+2)[0] == a_record):
+                    record_fields = a_record_unpack(dns_query, offset)
+                    if (record_fields[4][:2] == b'\x00\x04'):
+                        record_type, record = a_record, RESOURCE_RECORD(*record_fields)
+                        offset += 16
+
+                # anything else, or an a record with an unexpected data length, is parsed by name.
+                if (record is None):
+                    name_end = offset + parse_query_name(dns_query, offset)
+                    qtype  = dns_query[name_end:name_end+2].tobytes()
+                    dt_len = short_unpackf(dns_query, name_end+8)[0]
+
+                    record_type = int.from_bytes(qtype, 'big')
+                    record = RESOURCE_RECORD(
+                        dns_query[offset:name_end].tobytes(), qtype,
+                        dns_query[name_end+2:name_end+4].tobytes(),
+                        dns_query[name_end+4:name_end+8].tobytes(),
+                        dns_query[name_end+8:name_end+10+dt_len].tobytes()
+                    )
+
+                    offset = name_end + dt_len + 10 # length of data + 2 bytes(length field) + 8 bytes(type, class, ttl)
 
                 # incrementing a record counter to limit amount of records in response
-                if (record_type == DNS.AR):
+                if (record_type == a_record):
                     a_record_count += 1
 
-                # filtering out a records once max count is reached
-                if (a_record_count <= MAX_A_RECORD_COUNT or record_type != DNS.AR):
-                    r_field['records'].append(record)
-
-        # instance assignment to be used by response generation method
-        if (offset):
-            self._offset = offset
-
-    # creating byte container of dns record values to be used later. now rewriting ttl here.
-    def _parse_resource_record(self, total_offset):
-        local_record = self.resource_record[total_offset:]
-
-        offset = parse_query_name(local_record, self._dns_query)
-        name   = local_record[:offset]
-        qtype  = local_record[offset:offset+2]
-        qclass = local_record[offset+2:offset+4]
-        ttl    = local_record[offset+4:offset+8]
-        dt_len = short_unpack(local_record[offset+8:offset+10])[0]
-        data   = local_record[offset+8:offset+10+dt_len]
-
-        total_offset += offset + dt_len + 10 # length of data + 2 bytes(length field) + 8 bytes(type, class, ttl)
-
-        return short_unpack(qtype)[0], RESOURCE_RECORD(name, qtype, qclass, ttl, data), total_offset
-
-    def generate_server_response(self, dns_id):
-        send_data, original_ttl = [b'\x00'*14, self.question_record], 0
-        for i, r_field in enumerate(self.records):
-            for record in r_field['records']:
-                original_ttl, modified_ttl, modified_ttl_packed = self._get_new_ttl(record.ttl)
-                record.update('ttl', modified_ttl_packed)
-                send_data.append(b''.join(record))
+                # filtering out a records once max count is reached. ttl is rewritten as the record is kept
+                # so response generation does not need a second pass over the records.
+                if (a_record_count <= max_a_record_count or record_type != a_record):
+                    original_ttl, modified_ttl, modified_ttl_packed = get_new_ttl(record.ttl)
+                    record.update('ttl', modified_ttl_packed)
+                    records_add(record)
 
             # first enum iter filter(resource records) and ensuring its an a type, then creating cache data.
             if (not i and original_ttl):
@@ -249,28 +257,35 @@ class ServerResponse:
                     modified_ttl, r_field['records']
                 )
 
-        # prepending dns header to records. this is so we have new count calculated before header creation.
-        send_data[0] = self._create_header(dns_id)
+        # instance assignment to be used by response generation method
+        self._offset = offset
+
+    def generate_server_response(self, dns_id):
+        # record ttls were rewritten and counts finalized during parsing so the header can be created first.
+        send_data = [self._create_header(dns_id), self.question_record]
+        for r_field in self.records:
+            for record in r_field['records']:
+                send_data.extend(record)
 
         # additional records will remain intact until otherwise needed
         if (self.additional_count):
-            send_data.append(self.resource_record[self._offset:])
+            send_data.append(self._dns_query[self._offset:])
 
         self.send_data = b''.join(send_data)
 
-    def _get_new_ttl(self, record_ttl):
+    def _get_new_ttl(self, packed_ttl, *, _MIN=MINIMUM_TTL, _MAX=DEFAULT_TTL,
+            _MIN_PACKED=_MINIMUM_TTL_PACKED, _MAX_PACKED=_DEFAULT_TTL_PACKED):
         '''returns dns records original ttl, the rewritten ttl, and the packed for of the rewritten ttl.'''
-        record_ttl = long_unpack(record_ttl)[0]
-        if (record_ttl < MINIMUM_TTL):
-            new_record_ttl = MINIMUM_TTL
+        record_ttl = int.from_bytes(packed_ttl, 'big')
+        if (record_ttl < _MIN):
+            return record_ttl, _MIN, _MIN_PACKED
+
         # rewriting ttl to the remaining amount that was calculated from cached packet or to the maximum defined TTL
-        elif (record_ttl > DEFAULT_TTL):
-            new_record_ttl = DEFAULT_TTL
-        # anything in between the min and max TTL will be retained
-        else:
-            new_record_ttl = record_ttl
+        elif (record_ttl > _MAX):
+            return record_ttl, _MAX, _MAX_PACKED
 
-        return record_ttl, new_record_ttl, long_pack(new_record_ttl)
+        # anything in between the min and max TTL will be retained along with its original packed form
+        return record_ttl, record_ttl, packed_ttl
 
     def _create_header(self, dns_id):
         return dns_header_pack(
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import os, sys
-import traceback
 import time
 import threading
 import random
@@ -106,14 +105,21 @@ class DNSRelay:
             except OSError:
                 continue # can happen if epoll returns, but packet invalid
 
-            self._parse_packet(data, address, sock)
+            # empty datagrams have nothing to parse. ClientRequest would raise TypeError on them.
+            if (not data): continue
+
+            # last resort guard. this runs on the service loop so an unexpected error must not stop the listener.
+            try:
+                self._parse_packet(data, address, sock)
+            except Exception as E:
+                Log.p(f'LISTENER ERROR | {address[0]} | {E}')
 
     def _parse_packet(self, data, address, sock):
         client_query = ClientRequest(data, address, sock)
         try:
             client_query.parse()
-        except:
-            traceback.print_exc()
+        except PACKET_PARSE_ERRORS as E:
+            Log.p(f'CLIENT QUERY PARSE ERROR | {address[0]} | {E}')
         else:
             if (client_query.qr != DNS.QUERY or client_query.qtype not in [DNS.AR, DNS.NS] or client_query.dom_local): return
 
@@ -155,8 +161,8 @@ class DNSRelay:
         server_response = ServerResponse(server_response)
         try:
             server_response.parse()
-        except Exception:
-            raise
+        except PACKET_PARSE_ERRORS as E:
+            Log.p(f'SERVER RESPONSE PARSE ERROR | {E}')
         else:
             client_query = self._request_map_pop(server_response.dns_id, None)
             if (not client_query): return